@@ -1,3 +1,6 @@
+import importlib
+import threading
+
 import dash
 import dash_bootstrap_components as dbc
 import dash_bootstrap_templates
@@ -19,6 +22,28 @@ app._favicon = LOGO_FILE
 app.layout = html.Div(dash.page_container)
 dash_bootstrap_templates.load_figure_template(TEMPLATES)
 
+
+PREWARM_LOCK = threading.Lock()
+prewarmed = False
+
+
+@app.server.before_request
+def prewarm_pages() -> None:
+    """Fill the caches of pages that define prewarm() on background threads, once per serving process.
+
+    Running on the first request rather than at import skips the Werkzeug reloader's parent process and plain imports, while every WSGI worker still prewarms.
+    """
+    global prewarmed
+    with PREWARM_LOCK:
+        if prewarmed:
+            return
+        prewarmed = True
+    for page in dash.page_registry.values():
+        prewarm = getattr(importlib.import_module(page["module"]), "prewarm", None)
+        if prewarm:
+            threading.Thread(target=prewarm, daemon=True).start()
+
+
 clientside_callback(
     """
     (switchOn) => {
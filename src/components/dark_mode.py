@@ -1,10 +1,32 @@
+from functools import cache
+
 import plotly.io as pio
+from dash import Patch
 from plotly import graph_objects as go
 
 
+@cache
+def light_template() -> go.layout.Template:
+    """Return the light mode template, validated once on first use, since app.py registers the templates after the pages import."""
+    return go.layout.Template(pio.templates["journal"])
+
+
 def with_template_if_dark(fig: go.Figure, dark_mode: bool) -> go.Figure:
     """Update the figure template based on the dark mode setting."""
     fig["layout"]["paper_bgcolor"] = "rgba(0, 0, 0, 0)"
     if not dark_mode:
-        fig["layout"]["template"] = pio.templates["journal"]
+        # light_template is already valid, so assign it without validation, the same way plotly assigns its default template.
+        # Validating it again would deep-copy the whole template into every figure.
+        fig.layout._validate = False
+        try:
+            fig.layout.template = light_template()
+        finally:
+            fig.layout._validate = fig._validate
     return fig
+
+
+def template_patch(dark_mode: bool) -> Patch:
+    """Return a Patch that switches a figure from with_template_if_dark to the template for the dark mode setting, without rebuilding it."""
+    patch = Patch()
+    patch["layout"]["template"] = pio.templates[pio.templates.default] if dark_mode else light_template()
+    return patch
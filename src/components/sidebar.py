@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 import dash
 import dash_bootstrap_components as dbc
 from dash import dcc, html
@@ -7,6 +9,8 @@ from src.utils.scan_lists import MEMB_LISTS
 member_list_keys = list(MEMB_LISTS.keys())
 
 
+# Built on first page render rather than at import so that every page is already in the page registry.
+@lru_cache(maxsize=1)
 def sidebar() -> html.Div:
     return html.Div(
         children=[
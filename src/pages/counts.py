@@ -1,19 +1,20 @@
+from functools import lru_cache
+
 import dash
 import dash_bootstrap_components as dbc
-import pandas as pd
 import plotly.graph_objects as go
-from dash import Input, Output, callback, dcc, html
+from dash import Input, Output, Patch, State, callback, dcc, html
 
 from src.components import dark_mode
 from src.components import sidebar
 from src.utils import scan_lists
 
 METRICS = [
-    ["membership_type", "income-based", "Members Paying Income-Based Dues"],
-    ["membership_type", "lifetime", "Lifetime Members"],
-    ["membership_status", "member in good standing", "Members in Good Standing"],
-    ["membership_status", "member", "Expiring Members"],
-    ["membership_status", "lapsed", "Lapsed Members"],
+    ["membership_type", "income-based", "Members Paying Income-Based Dues", "count-income-based"],
+    ["membership_type", "lifetime", "Lifetime Members", "count-lifetime"],
+    ["membership_status", "member in good standing", "Members in Good Standing", "count-migs"],
+    ["membership_status", "member", "Expiring Members", "count-expiring"],
+    ["membership_status", "lapsed", "Lapsed Members", "count-lapsed"],
 ]
 
 dash.register_page(__name__, path="/counts", title=f"Membership Dashboard: {__name__.title()}", order=2)
@@ -25,53 +26,15 @@ membership_counts = html.Div(
                 dbc.Col(
                     dcc.Graph(
                         figure=go.Figure(),
-                        id="count-income-based",
-                        style={"height": "30svh"},
-                    ),
-                    width=6,
-                ),
-                dbc.Col(
-                    dcc.Graph(
-                        figure=go.Figure(),
-                        id="count-lifetime",
+                        id=component_id,
                         style={"height": "30svh"},
                     ),
                     width=6,
-                ),
+                )
+                for _, _, _, component_id in METRICS[row_start : row_start + 2]
             ],
-        ),
-        dbc.Row(
-            [
-                dbc.Col(
-                    dcc.Graph(
-                        figure=go.Figure(),
-                        id="count-migs",
-                        style={"height": "30svh"},
-                    ),
-                    width=6,
-                ),
-                dbc.Col(
-                    dcc.Graph(
-                        figure=go.Figure(),
-                        id="count-expiring",
-                        style={"height": "30svh"},
-                    ),
-                    width=6,
-                ),
-            ]
-        ),
-        dbc.Row(
-            [
-                dbc.Col(
-                    dcc.Graph(
-                        figure=go.Figure(),
-                        id="count-lapsed",
-                        style={"height": "30svh"},
-                    ),
-                    width=6,
-                ),
-            ]
-        ),
+        )
+        for row_start in range(0, len(METRICS), 2)
     ],
 )
 
@@ -80,15 +43,27 @@ def layout() -> dbc.Row:
     return dbc.Row([dbc.Col(sidebar.sidebar(), width=2), dbc.Col(membership_counts, width=10)], className="dbc", style={"margin": "1em"})
 
 
-def calculate_metric(df: pd.DataFrame, df_compare: pd.DataFrame, plan: list[str], is_dark_mode: bool) -> go.Figure:
+@lru_cache(maxsize=32)
+def column_value_counts(list_date: str, column: str) -> dict[str, int]:
+    """Return the count of each value in column of the list from list_date, computed once per list so redrawing the figures is cheap."""
+    df = scan_lists.MEMB_LISTS.get(list_date, scan_lists.EMPTY_LIST)
+    return df[column].value_counts().to_dict()
+
+
+def count_members(list_date: str, column: str, value: str) -> int:
+    """Return how many members of the list from list_date have value in column, sharing one column_value_counts pass across every metric."""
+    return column_value_counts(list_date, column).get(value, 0)
+
+
+def calculate_metric(date_selected: str, date_compare_selected: str, plan: list[str], is_dark_mode: bool) -> go.Figure:
     """Construct string showing value and change (if comparison data is provided)."""
-    column, value, title = plan
-    count = df[column].eq(value).sum()
+    column, value, title, _ = plan
+    count = count_members(date_selected, column, value)
     indicator_mode = "number"
     indicator_delta = None
 
-    if not df_compare.empty:
-        count_compare = df_compare[column].eq(value).sum()
+    if date_compare_selected in scan_lists.MEMB_LISTS:
+        count_compare = count_members(date_compare_selected, column, value)
         indicator_mode = "number+delta"
         indicator_delta = {
             "position": "top",
@@ -108,21 +83,24 @@ def calculate_metric(df: pd.DataFrame, df_compare: pd.DataFrame, plan: list[str]
 
 
 @callback(
-    Output(component_id="count-income-based", component_property="figure"),
-    Output(component_id="count-lifetime", component_property="figure"),
-    Output(component_id="count-migs", component_property="figure"),
-    Output(component_id="count-expiring", component_property="figure"),
-    Output(component_id="count-lapsed", component_property="figure"),
+    [Output(component_id=component_id, component_property="figure") for _, _, _, component_id in METRICS],
     Input(component_id="list-selected", component_property="value"),
     Input(component_id="list-compare", component_property="value"),
-    Input(component_id="color-mode-switch", component_property="value"),
+    State(component_id="color-mode-switch", component_property="value"),
 )
 def create_metrics(date_selected: str, date_compare_selected: str, dark_mode: bool) -> list[go.Figure]:
     """Update the numeric metrics shown based on the selected membership list date and compare date (if applicable)."""
     if not date_selected:
         return [go.Figure()] * len(METRICS)
 
-    df = scan_lists.MEMB_LISTS.get(date_selected, pd.DataFrame())
-    df_compare = scan_lists.MEMB_LISTS.get(date_compare_selected, pd.DataFrame())
+    return [calculate_metric(date_selected, date_compare_selected, metric_plan, dark_mode) for metric_plan in METRICS]
 
-    return [calculate_metric(df, df_compare, metric_plan, dark_mode) for metric_plan in METRICS]
+
+@callback(
+    [Output(component_id=component_id, component_property="figure", allow_duplicate=True) for _, _, _, component_id in METRICS],
+    Input(component_id="color-mode-switch", component_property="value"),
+    prevent_initial_call=True,
+)
+def update_metrics_template(is_dark_mode: bool) -> list[Patch]:
+    """Switch the template of the numeric metrics when the color mode changes, without recounting."""
+    return [dark_mode.template_patch(is_dark_mode)] * len(METRICS)
@@ -2,13 +2,21 @@ import dash
 import dash_bootstrap_components as dbc
 import pandas as pd
 import plotly.graph_objects as go
-from dash import Input, Output, callback, dcc, html
+from dash import Input, Output, Patch, State, callback, dcc, html
 
 from src.components import colors
 from src.components import dark_mode
 from src.components import sidebar
 from src.utils import scan_lists
 
+CHARTS = [
+    ("graph-membership-status", "Membership Counts", False),
+    ("graph-membership-type", "Dues of Members in Good Standing", True),
+    ("graph-union-member", "Union Membership of Constitutional Members", True),
+    ("graph-membership-length", "Length of Membership of Constitutional Members (0 - 8+yrs)", False),
+    ("graph-race", "Racial Demographics of Constitutional Members", True),
+]
+
 dash.register_page(__name__, path="/graphs", title=f"Membership Dashboard: {__name__.title()}", order=3)
 
 membership_graphs = html.Div(
@@ -72,24 +80,49 @@ def get_positive_sign(num: float) -> str:
     return "+" if num > 0 else ""
 
 
+def multiple_choice(df_field: pd.Series, separator: str) -> pd.Series:
+    """Split a character-separated list string into one row per choice."""
+    return df_field.str.split(separator, regex=False).explode()
+
+
+def chart_fields(df: pd.DataFrame) -> list[pd.Series]:
+    """Return the data plotted in each chart."""
+    membersdf = df.loc[~df["membership_status"].isin(["lapsed", "expired"]), ["union_member", "membership_length_years", "race"]]
+    return [
+        df["membership_status"],
+        df.loc[df["membership_status"] == "member in good standing", "membership_type"],
+        membersdf["union_member"],
+        membersdf["membership_length_years"].clip(upper=8),
+        multiple_choice(membersdf["race"], ","),
+    ]
+
+
+def chart_value_counts(df: pd.DataFrame) -> tuple[pd.Series, ...]:
+    """Return scan_lists.observed_value_counts of each chart's data in df."""
+    return tuple(scan_lists.observed_value_counts(df_field) for df_field in chart_fields(df))
+
+
+# Aggregate every list once at startup so callbacks only have to build figures.
+CHART_VALUE_COUNTS = {list_date: chart_value_counts(memb_list) for list_date, memb_list in scan_lists.MEMB_LISTS.items()}
+EMPTY_CHART_VALUE_COUNTS = tuple(pd.Series(dtype="int64") for _ in CHARTS)
+
+
 def create_chart(
-    df_field: pd.DataFrame,
-    df_compare_field: pd.DataFrame,
+    chartdf_vc: pd.Series,
+    chartdf_compare_vc: pd.Series,
     title: str,
     ylabel: str,
     log: bool,
+    compare_selected: bool,
 ) -> go.Figure:
-    """Set up html data to show a chart of 1-2 dataframes."""
-    chartdf_vc = df_field.value_counts()
-    chartdf_compare_vc = df_compare_field.value_counts()
-
+    """Set up html data to show a chart of the value counts of 1-2 dataframes, colored and labeled for comparison if compare_selected."""
     color, color_compare = colors.COLORS, colors.COLORS
     active_labels = [str(val) for val in chartdf_vc.values]
 
-    if not df_compare_field.empty:
+    if compare_selected:
         color, color_compare = colors.COMPARE_COLORS[1], colors.COMPARE_COLORS[0]
-        diff_counts = [count - chartdf_compare_vc.get(val, 0) for val, count in zip(chartdf_vc.index, chartdf_vc.values, strict=True)]
-        active_labels = [f"{count} ({get_positive_sign(diff)}{diff})" for count, diff in zip(chartdf_vc.values, diff_counts, strict=True)]
+        diff_counts = chartdf_vc - chartdf_compare_vc.reindex(chartdf_vc.index, fill_value=0).to_numpy()
+        active_labels = [f"{count} ({get_positive_sign(diff)}{diff})" for count, diff in zip(chartdf_vc.values, diff_counts.values, strict=True)]
 
     chart = go.Figure(
         data=[
@@ -119,70 +152,35 @@ def create_chart(
 
 
 @callback(
-    Output(component_id="graph-membership-status", component_property="figure"),
-    Output(component_id="graph-membership-type", component_property="figure"),
-    Output(component_id="graph-union-member", component_property="figure"),
-    Output(component_id="graph-membership-length", component_property="figure"),
-    Output(component_id="graph-race", component_property="figure"),
+    [Output(component_id=component_id, component_property="figure") for component_id, _, _ in CHARTS],
     Input(component_id="list-selected", component_property="value"),
     Input(component_id="list-compare", component_property="value"),
-    Input(component_id="color-mode-switch", component_property="value"),
+    State(component_id="color-mode-switch", component_property="value"),
 )
 def create_graphs(date_selected: str, date_compare_selected: str, is_dark_mode: bool) -> [go.Figure] * 5:
     """Update the graphs shown based on the selected membership list date and compare date (if applicable)."""
     if not date_selected:
         return [go.Figure()] * 5
 
-    df = scan_lists.MEMB_LISTS.get(date_selected, pd.DataFrame())
-    df_compare = scan_lists.MEMB_LISTS.get(date_compare_selected, pd.DataFrame())
-
-    def multiple_choice(df_mc: pd.DataFrame, target_column: str, separator: str) -> pd.DataFrame:
-        """Split a character-separated list string into an iterable object."""
-        return df_mc.assign(**{target_column: df_mc[target_column].str.split(separator)}).explode(target_column).reset_index(drop=True)
-
-    membersdf = df.query('membership_status != "lapsed" and membership_status != "expired"')
-    membersdf_compare = (
-        df_compare.query('membership_status != "lapsed" and membership_status != "expired"') if "membership_status" in df_compare else pd.DataFrame()
-    )
-
+    compare_selected = date_compare_selected in scan_lists.MEMB_LISTS
     charts = [
-        create_chart(
-            df["membership_status"] if "membership_status" in df else pd.DataFrame(),
-            df_compare["membership_status"] if "membership_status" in df_compare else pd.DataFrame(),
-            "Membership Counts",
-            "Members",
-            False,
-        ),
-        create_chart(
-            df.loc[df["membership_status"] == "member in good standing"]["membership_type"] if "membership_status" in df else pd.DataFrame(),
-            df_compare.loc[df_compare["membership_status"] == "member in good standing"]["membership_type"]
-            if "membership_status" in df_compare
-            else pd.DataFrame(),
-            "Dues of Members in Good Standing",
-            "Members",
-            True,
-        ),
-        create_chart(
-            membersdf["union_member"] if "union_member" in df else pd.DataFrame(),
-            membersdf_compare["union_member"] if "union_member" in df_compare else pd.DataFrame(),
-            "Union Membership of Constitutional Members",
-            "Members",
-            True,
-        ),
-        create_chart(
-            membersdf["membership_length_years"].clip(upper=8) if "membership_length_years" in df else pd.DataFrame(),
-            membersdf_compare["membership_length_years"].clip(upper=8) if "membership_length_years" in membersdf_compare else pd.DataFrame(),
-            "Length of Membership of Constitutional Members (0 - 8+yrs)",
-            "Members",
-            False,
-        ),
-        create_chart(
-            multiple_choice(membersdf, "race", ",")["race"] if "race" in df else pd.DataFrame(),
-            multiple_choice(membersdf_compare, "race", ",")["race"] if "race" in membersdf_compare else pd.DataFrame(),
-            "Racial Demographics of Constitutional Members",
-            "Members",
-            True,
-        ),
+        create_chart(chartdf_vc, chartdf_compare_vc, title, "Members", log, compare_selected)
+        for chartdf_vc, chartdf_compare_vc, (_, title, log) in zip(
+            CHART_VALUE_COUNTS.get(date_selected, EMPTY_CHART_VALUE_COUNTS),
+            CHART_VALUE_COUNTS.get(date_compare_selected, EMPTY_CHART_VALUE_COUNTS),
+            CHARTS,
+            strict=True,
+        )
     ]
 
     return [dark_mode.with_template_if_dark(chart, is_dark_mode) for chart in charts]
+
+
+@callback(
+    [Output(component_id=component_id, component_property="figure", allow_duplicate=True) for component_id, _, _ in CHARTS],
+    Input(component_id="color-mode-switch", component_property="value"),
+    prevent_initial_call=True,
+)
+def update_graphs_template(is_dark_mode: bool) -> list[Patch]:
+    """Switch the template of the graphs when the color mode changes, without recounting."""
+    return [dark_mode.template_patch(is_dark_mode)] * len(CHARTS)
@@ -1,5 +1,8 @@
+from functools import lru_cache
+
 import dash
 import dash_bootstrap_components as dbc
+import numpy as np
 import pandas as pd
 from dash import Input, Output, callback, dash_table, html
 
@@ -8,13 +11,23 @@ from src.components import sidebar
 from src.utils import scan_lists
 from src.utils import schema
 
+# Besides actionkit_id (the index), the columns whose changes make a member show up when comparing lists
+COMPARE_COLUMNS = [
+    "accommodations",
+    "city",
+    "membership_status",
+    "membership_type",
+    "monthly_dues_status",
+    "yearly_dues_status",
+]
+
 dash.register_page(__name__, path="/list", title=f"Membership Dashboard: {__name__.title()}", order=1)
 
 membership_list = html.Div(
     children=[
         dash_table.DataTable(
             data=[],
-            columns=[{"name": i, "id": i, "selectable": True} for i in schema.schema.columns],
+            columns=[{"name": i, "id": i, "selectable": True} for i in schema.COLUMN_NAMES],
             sort_action="native",
             sort_by=[
                 {"column_id": "last_name", "direction": "asc"},
@@ -40,6 +53,18 @@ def layout() -> dbc.Row:
     return dbc.Row([dbc.Col(sidebar.sidebar(), width=2), dbc.Col(membership_list, width=10)], className="dbc", style={"margin": "1em"})
 
 
+def decategorized(df: pd.DataFrame) -> pd.DataFrame:
+    """Return df with any categorical columns converted to objects, so lists with different categories concatenate cleanly."""
+    return df.astype({column: object for column in df.select_dtypes("category").columns})
+
+
+def changed_rows(df: pd.DataFrame, df_compare: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """Return masks of the rows in each list whose actionkit_id and COMPARE_COLUMNS values occur only once across both lists."""
+    keys = pd.concat([decategorized(memb_list.reindex(columns=COMPARE_COLUMNS)).reset_index() for memb_list in (df, df_compare)], ignore_index=True)
+    unique_rows = ~keys.duplicated(keep=False).to_numpy()
+    return unique_rows[: len(df)], unique_rows[len(df) :]
+
+
 @callback(
     Output(component_id="list", component_property="data"),
     Output(component_id="list", component_property="style_data_conditional"),
@@ -48,31 +73,30 @@ def layout() -> dbc.Row:
 )
 def create_list(date_selected: str, date_compare_selected: str) -> (dict, list):
     """Update the list shown based on the selected membership list date."""
-    df = scan_lists.MEMB_LISTS.get(date_selected, pd.DataFrame())
-    df_compare = scan_lists.MEMB_LISTS.get(date_compare_selected, pd.DataFrame())
+    return list_records(date_selected, date_compare_selected)
+
+
+# Records for a full list are large, so only the most recent few selections are kept.
+@lru_cache(maxsize=4)
+def list_records(date_selected: str, date_compare_selected: str) -> (dict, list):
+    """Return the table records and row styles for the selected membership list date and compare date (if applicable)."""
+    df = scan_lists.MEMB_LISTS.get(date_selected, scan_lists.EMPTY_LIST)
+    df_compare = scan_lists.MEMB_LISTS.get(date_compare_selected, scan_lists.EMPTY_LIST)
 
     if df_compare.empty:
         return df.reset_index(drop=False).to_dict("records"), []
 
-    df["list_date"] = date_selected
-    df_compare["list_date"] = date_compare_selected
-
+    changed, changed_compare = changed_rows(df, df_compare)
     records = (
-        pd.concat([df, df_compare])
-        .reset_index(drop=False)
-        .drop_duplicates(
-            subset=[
-                "actionkit_id",
-                "accommodations",
-                "city",
-                "membership_status",
-                "membership_type",
-                "monthly_dues_status",
-                "yearly_dues_status",
-            ],
-            keep=False,
+        pd.concat(
+            [
+                decategorized(df.loc[changed]).assign(list_date=date_selected),
+                decategorized(df_compare.loc[changed_compare]).assign(list_date=date_compare_selected),
+            ]
         )
-    ).to_dict("records")
+        .reset_index(drop=False)
+        .to_dict("records")
+    )
 
     conditional_style = [
         {
@@ -89,3 +113,9 @@ def create_list(date_selected: str, date_compare_selected: str) -> (dict, list):
     ]
 
     return records, conditional_style
+
+
+def prewarm() -> None:
+    """Build the table records the page opens with for the latest list, so the first visit doesn't wait for them."""
+    if scan_lists.MEMB_LISTS:
+        list_records(next(iter(scan_lists.MEMB_LISTS)), None)
@@ -1,15 +1,17 @@
+from functools import lru_cache
 from pathlib import Path, PurePath
 
 import dash
 import dash_bootstrap_components as dbc
 import dotenv
+import numpy as np
 import pandas as pd
-import plotly.express as px
 import plotly.graph_objects as go
 import plotly.io as pio
-from dash import Input, Output, callback, dcc, html
+from dash import Input, Output, Patch, State, callback, dcc, html
 
 from src.components import colors
+from src.components import dark_mode
 from src.components import sidebar
 from src.components import status_filter
 from src.utils import scan_lists
@@ -19,8 +21,6 @@ dash.register_page(__name__, path="/map", title=f"Membership Dashboard: {__name_
 
 config = dotenv.dotenv_values(Path(PurePath(__file__).parents[2], ".env"))
 
-if "MAPBOX" in config:
-    px.set_mapbox_access_token(config.get("MAPBOX"))
 
 membership_map = html.Div(
     children=[
@@ -28,7 +28,7 @@ membership_map = html.Div(
             [
                 status_filter.status_filter_col(),
                 dbc.Col(
-                    dcc.Dropdown(options=list(column for column in schema.schema.columns), value="membership_status", multi=False, id="selected-column"),
+                    dcc.Dropdown(options=schema.COLUMN_NAMES, value="membership_status", multi=False, id="selected-column"),
                 ),
             ],
             align="center",
@@ -57,47 +57,89 @@ def layout() -> dbc.Row:
     return dbc.Row([dbc.Col(sidebar.sidebar(), width=2), dbc.Col(membership_map, width=10)], className="dbc", style={"margin": "1em"})
 
 
+HOVER_DATA = {
+    "first_name": True,
+    "last_name": True,
+    "best_phone": True,
+    "email": True,
+    "membership_type": True,
+    "membership_status": True,
+    "membership_length_years": True,
+    "join_date": True,
+    "xdate": True,
+    "lat": False,
+    "lon": False,
+}
+
+
+def map_center(df_map: pd.DataFrame) -> dict[str, float] | None:
+    """Return the mean position of the geocoded members in df_map, ignoring the 0, 0 given to addresses that could not be geocoded."""
+    lat = df_map["lat"].to_numpy()
+    lon = df_map["lon"].to_numpy()
+    located = ~(np.isnan(lat) | np.isnan(lon) | ((lat == 0) & (lon == 0)))
+    if not located.any():
+        return None
+    return {"lat": float(lat[located].mean()), "lon": float(lon[located].mean())}
+
+
 @callback(
     Output(component_id="map", component_property="figure"),
     Input(component_id="list-selected", component_property="value"),
     Input(component_id="selected-column", component_property="value"),
     Input(component_id="status-filter", component_property="value"),
-    Input(component_id="color-mode-switch", component_property="value"),
+    State(component_id="color-mode-switch", component_property="value"),
 )
-def create_map(date_selected: str, selected_column: str, selected_statuses: list[str], dark_mode: bool) -> px.scatter_mapbox:
+def create_map(date_selected: str, selected_column: str, selected_statuses: list[str], is_dark_mode: bool) -> go.Figure:
     """Set up html data to show a map of Maine DSA members."""
-    df_map = scan_lists.MEMB_LISTS.get(date_selected, pd.DataFrame())
-    df_map = df_map.loc[df_map["membership_status"].isin(selected_statuses)]
+    return map_for_selection(date_selected, selected_column, tuple(sorted(selected_statuses)), is_dark_mode)
+
+
+@callback(
+    Output(component_id="map", component_property="figure", allow_duplicate=True),
+    Input(component_id="color-mode-switch", component_property="value"),
+    prevent_initial_call=True,
+)
+def update_map_template(is_dark_mode: bool) -> Patch:
+    """Switch the map style and template when the color mode changes, without re-plotting the members."""
+    patch = dark_mode.template_patch(is_dark_mode)
+    patch["layout"]["mapbox"]["style"] = "dark" if is_dark_mode else "light"
+    return patch
+
+
+@lru_cache(maxsize=64)
+def map_for_selection(date_selected: str, selected_column: str, selected_statuses: tuple[str, ...], dark_mode: bool) -> go.Figure:
+    """Build the member map for one combination of inputs, cached so that flipping back to an earlier selection skips re-plotting every member."""
+    # plotly express is slow to import and only the map uses it, so it is loaded on the first map drawn
+    import plotly.express as px
+
+    if "MAPBOX" in config:
+        px.set_mapbox_access_token(config.get("MAPBOX"))
+
+    df_map = scan_lists.MEMB_LISTS.get(date_selected, scan_lists.EMPTY_LIST)
+    # Only pass plotly the columns the map shows, so it doesn't copy the whole list
+    df_map = df_map.loc[scan_lists.category_mask(df_map["membership_status"], selected_statuses), list(dict.fromkeys([*HOVER_DATA, selected_column]))]
 
     map_figure = px.scatter_mapbox(
         df_map.reset_index(drop=False),
         lat="lat",
         lon="lon",
         hover_name="actionkit_id",
-        hover_data={
-            "first_name": True,
-            "last_name": True,
-            "best_phone": True,
-            "email": True,
-            "membership_type": True,
-            "membership_status": True,
-            "membership_length_years": True,
-            "join_date": True,
-            "xdate": True,
-            "lat": False,
-            "lon": False,
-        },
+        hover_data=dict(HOVER_DATA),  # plotly rewrites the values of hover_data in place
         color=selected_column,
         color_discrete_sequence=colors.COLORS,
+        center=map_center(df_map),
         zoom=6,
         height=1100,
-        mapbox_style="dark",
-        template=pio.templates["darkly"],
+        mapbox_style="dark" if dark_mode else "light",
+        template=pio.templates["darkly" if dark_mode else "journal"],
     )
 
-    if not dark_mode:
-        map_figure.update_layout(mapbox_style="light", template=pio.templates["journal"])
-
     map_figure.update_layout(margin={"r": 0, "t": 0, "l": 0, "b": 0})
 
     return map_figure
+
+
+def prewarm() -> None:
+    """Build the map the page opens with for the latest list, so the first visit doesn't wait for it."""
+    if scan_lists.MEMB_LISTS:
+        map_for_selection(next(iter(scan_lists.MEMB_LISTS)), "membership_status", tuple(sorted(schema.ColumnValidation.MEMBERSHIP_STATUS)), True)
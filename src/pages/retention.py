@@ -1,8 +1,12 @@
+import datetime
+from functools import lru_cache
+from typing import NamedTuple
+
 import dash
 import dash_bootstrap_components as dbc
 import pandas as pd
 import plotly.graph_objects as go
-from dash import Input, Output, callback, dcc, html
+from dash import Input, Output, Patch, State, callback, dcc, html
 
 from src.components import colors
 from src.components import dark_mode
@@ -12,199 +16,256 @@ from src.utils import scan_lists
 
 dash.register_page(__name__, path="/retention", title=f"Membership Dashboard: {__name__.title()}", order=4)
 
-today_date = pd.to_datetime("today")
+today_date = datetime.date.today()
 earliest_year = 1982
-today_year = int(today_date.date().strftime("%Y"))
+today_year = today_date.year
 
 default_start_year = 2016
-default_end_date = pd.to_datetime("today") - pd.tseries.offsets.DateOffset(months=14)
-default_end_year = int(default_end_date.date().strftime("%Y"))
+# The year it was 14 months ago
+default_end_year = (today_date.year * 12 + today_date.month - 1 - 14) // 12
 years_between = {i: f"{i}" for i in range(earliest_year, today_year, 4)}
 
-membership_retention = html.Div(
-    children=[
-        dbc.Row(
-            dbc.Col(
-                dcc.RangeSlider(
-                    min=earliest_year,
-                    max=today_year,
-                    step=1,
-                    marks=years_between,
-                    value=[default_start_year, default_end_year],
-                    id="retention-years-slider",
-                    tooltip={"placement": "bottom"},
-                ),
-            ),
-        ),
-        dbc.Row(
-            [
+RETENTION_GRAPHS = [
+    "retention-count-years",
+    "retention-count-months",
+    "retention-percent-years",
+    "retention-percent-months",
+    "retention-nth-year",
+    "retention-nth-quarter",
+    "retention-yoy-year",
+    "retention-yoy-month",
+    "retention-tenure-member",
+    "retention-tenure-lapsed",
+]
+
+
+# Built on first page render rather than at import, like the sidebar.
+@lru_cache(maxsize=1)
+def membership_retention() -> html.Div:
+    return html.Div(
+        children=[
+            dbc.Row(
                 dbc.Col(
-                    dcc.Graph(
-                        figure=go.Figure(),
-                        id="retention-count-years",
-                        style={"height": "45svh"},
+                    dcc.RangeSlider(
+                        min=earliest_year,
+                        max=today_year,
+                        step=1,
+                        marks=years_between,
+                        value=[default_start_year, default_end_year],
+                        id="retention-years-slider",
+                        tooltip={"placement": "bottom"},
                     ),
-                    md=6,
                 ),
-                dbc.Col(
-                    dcc.Graph(
-                        figure=go.Figure(),
-                        id="retention-count-months",
-                        style={"height": "45svh"},
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        dcc.Graph(
+                            figure={},
+                            id="retention-count-years",
+                            style={"height": "45svh"},
+                        ),
+                        md=6,
                     ),
-                    md=6,
-                ),
-            ],
-            align="center",
-        ),
-        dbc.Row(
-            [
-                dbc.Col(
-                    dcc.Graph(
-                        figure=go.Figure(),
-                        id="retention-percent-years",
-                        style={"height": "45svh"},
+                    dbc.Col(
+                        dcc.Graph(
+                            figure={},
+                            id="retention-count-months",
+                            style={"height": "45svh"},
+                        ),
+                        md=6,
                     ),
-                    md=6,
-                ),
-                dbc.Col(
-                    dcc.Graph(
-                        figure=go.Figure(),
-                        id="retention-percent-months",
-                        style={"height": "45svh"},
+                ],
+                align="center",
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        dcc.Graph(
+                            figure={},
+                            id="retention-percent-years",
+                            style={"height": "45svh"},
+                        ),
+                        md=6,
                     ),
-                    md=6,
-                ),
-            ],
-            align="center",
-        ),
-        dbc.Row(
-            [
-                dbc.Col(
-                    dcc.Graph(
-                        figure=go.Figure(),
-                        id="retention-nth-year",
-                        style={"height": "45svh"},
+                    dbc.Col(
+                        dcc.Graph(
+                            figure={},
+                            id="retention-percent-months",
+                            style={"height": "45svh"},
+                        ),
+                        md=6,
                     ),
-                    md=6,
-                ),
-                dbc.Col(
-                    dcc.Graph(
-                        figure=go.Figure(),
-                        id="retention-nth-quarter",
-                        style={"height": "45svh"},
+                ],
+                align="center",
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        dcc.Graph(
+                            figure={},
+                            id="retention-nth-year",
+                            style={"height": "45svh"},
+                        ),
+                        md=6,
                     ),
-                    md=6,
-                ),
-            ],
-            align="center",
-        ),
-        dbc.Row(
-            [
-                dbc.Col(
-                    dcc.Graph(
-                        figure=go.Figure(),
-                        id="retention-yoy-year",
-                        style={"height": "45svh"},
+                    dbc.Col(
+                        dcc.Graph(
+                            figure={},
+                            id="retention-nth-quarter",
+                            style={"height": "45svh"},
+                        ),
+                        md=6,
                     ),
-                    md=6,
-                ),
-                dbc.Col(
-                    dcc.Graph(
-                        figure=go.Figure(),
-                        id="retention-yoy-month",
-                        style={"height": "45svh"},
+                ],
+                align="center",
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        dcc.Graph(
+                            figure={},
+                            id="retention-yoy-year",
+                            style={"height": "45svh"},
+                        ),
+                        md=6,
                     ),
-                    md=6,
-                ),
-            ],
-            align="center",
-        ),
-        dbc.Row(
-            [
-                dbc.Col(
-                    dcc.Graph(
-                        figure=go.Figure(),
-                        id="retention-tenure-member",
-                        style={"height": "45svh"},
+                    dbc.Col(
+                        dcc.Graph(
+                            figure={},
+                            id="retention-yoy-month",
+                            style={"height": "45svh"},
+                        ),
+                        md=6,
                     ),
-                    md=6,
-                ),
-                dbc.Col(
-                    dcc.Graph(
-                        figure=go.Figure(),
-                        id="retention-tenure-lapsed",
-                        style={"height": "45svh"},
+                ],
+                align="center",
+            ),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        dcc.Graph(
+                            figure={},
+                            id="retention-tenure-member",
+                            style={"height": "45svh"},
+                        ),
+                        md=6,
                     ),
-                    md=6,
-                ),
-            ],
-            align="center",
-        ),
-    ],
-)
+                    dbc.Col(
+                        dcc.Graph(
+                            figure={},
+                            id="retention-tenure-lapsed",
+                            style={"height": "45svh"},
+                        ),
+                        md=6,
+                    ),
+                ],
+                align="center",
+            ),
+        ],
+    )
 
 
 def layout() -> dbc.Row:
-    return dbc.Row([dbc.Col(sidebar.sidebar(), width=2), dbc.Col(membership_retention, width=10)], className="dbc", style={"margin": "1em"})
+    return dbc.Row([dbc.Col(sidebar.sidebar(), width=2), dbc.Col(membership_retention(), width=10)], className="dbc", style={"margin": "1em"})
+
+
+class RetentionData(NamedTuple):
+    df_ry: pd.DataFrame
+    df_rm: pd.DataFrame
+    df_rpy: pd.DataFrame
+    df_rpm: pd.DataFrame
+    df_rpq: pd.DataFrame
+    df_ml_vc: pd.Series
+    df_ll_vc: pd.Series
+
+
+@lru_cache(maxsize=16)
+def retention_data(date_selected: str, start_year: int, end_year: int) -> RetentionData:
+    """Calculate the retention tables and tenure counts for the list from date_selected, once per list date and range of join years."""
+    df = scan_lists.MEMB_LISTS.get(date_selected, scan_lists.EMPTY_LIST)
+    in_cohorts = (df["membership_type"] != "lifetime") & df["join_year"].between(pd.Timestamp(start_year, 1, 1), pd.Timestamp(end_year, 1, 1))
+    df_df = df.loc[in_cohorts, ["join_year", "join_quarter", "membership_status", "membership_length_years", "membership_length_months"]]
+    df_df = df_df.assign(
+        membership_length_months=df_df["membership_length_months"].mask(
+            df_df["membership_status"] == "member in good standing",
+            df_df["membership_length_years"].multiply(12),
+        )
+    )
+
+    return RetentionData(
+        df_ry=retention.retention_year(df_df),
+        df_rm=retention.retention_mos(df_df),
+        df_rpy=retention.retention_pct_year(df_df),
+        df_rpm=retention.retention_pct_mos(df_df),
+        df_rpq=retention.retention_pct_quarter(df_df),
+        df_ml_vc=retention.tenure_shares(df.loc[df["memb_status_letter"] == "M", "membership_length_years"]),
+        df_ll_vc=retention.tenure_shares(df.loc[df["memb_status_letter"] == "L", "membership_length_years"]),
+    )
 
 
 @callback(
-    Output(component_id="retention-count-years", component_property="figure"),
-    Output(component_id="retention-count-months", component_property="figure"),
-    Output(component_id="retention-percent-years", component_property="figure"),
-    Output(component_id="retention-percent-months", component_property="figure"),
-    Output(component_id="retention-nth-year", component_property="figure"),
-    Output(component_id="retention-nth-quarter", component_property="figure"),
-    Output(component_id="retention-yoy-year", component_property="figure"),
-    Output(component_id="retention-yoy-month", component_property="figure"),
-    Output(component_id="retention-tenure-member", component_property="figure"),
-    Output(component_id="retention-tenure-lapsed", component_property="figure"),
+    [Output(component_id=component_id, component_property="figure") for component_id in RETENTION_GRAPHS],
     Input(component_id="list-selected", component_property="value"),
     Input(component_id="retention-years-slider", component_property="value"),
-    Input(component_id="color-mode-switch", component_property="value"),
+    State(component_id="color-mode-switch", component_property="value"),
 )
 def create_retention(date_selected: str, years: list[int], is_dark_mode: bool) -> [go.Figure] * 10:
     """Update the retention graphs shown based on the selected membership list date."""
     if not date_selected:
         return [go.Figure()] * 10
 
-    df = scan_lists.MEMB_LISTS.get(date_selected, pd.DataFrame())
-    df_df = df.loc[df["membership_type"] != "lifetime"]
-    df_df = df_df.loc[(df["join_year"] >= pd.to_datetime(years[0], format="%Y")) & (df_df["join_year"] <= pd.to_datetime(years[1], format="%Y"))]
-    df_df.loc[
-        df_df["membership_status"] == "member in good standing",
-        "membership_length_months",
-    ] = df_df["membership_length_years"].multiply(12)
+    return list(retention_figures(date_selected, years[0], years[1], is_dark_mode))
+
+
+@callback(
+    [Output(component_id=component_id, component_property="figure", allow_duplicate=True) for component_id in RETENTION_GRAPHS],
+    Input(component_id="color-mode-switch", component_property="value"),
+    prevent_initial_call=True,
+)
+def update_retention_template(is_dark_mode: bool) -> list[Patch]:
+    """Switch the template of the retention graphs when the color mode changes, without rebuilding them."""
+    return [dark_mode.template_patch(is_dark_mode)] * len(RETENTION_GRAPHS)
+
+
+@lru_cache(maxsize=16)
+def retention_figures(date_selected: str, start_year: int, end_year: int, is_dark_mode: bool) -> tuple[go.Figure, ...]:
+    """Build the retention graphs for one combination of inputs, cached so that returning to an earlier selection skips rebuilding them."""
+    df_ry, df_rm, df_rpy, df_rpm, df_rpq, df_ml_vc, df_ll_vc = retention_data(date_selected, start_year, end_year)
 
-    df_ry = retention.retention_year(df_df)
-    df_rm = retention.retention_mos(df_df)
-    df_rpy = retention.retention_pct_year(df_df)
-    df_rpm = retention.retention_pct_mos(df_df)
-    df_rpq = retention.retention_pct_quarter(df_df)
+    # Plot each cohort from a row of the underlying array instead of looking its label up in the frame.
+    # float32 is plenty for counts and percentages and lets plotly send the rows as compact typed arrays, with gaps as NaN.
+    ry_rows, rm_rows, rpy_rows, rpm_rows = (df.to_numpy(dtype="float32") for df in (df_ry, df_rm, df_rpy, df_rpm))
+    # Year-over-year change along each cohort's row, computed on the transposed tables because pct_change(axis=1) fragments the mixed-dtype percent tables
+    ry_yoy_rows = df_ry.T.pct_change(fill_method=None).T.to_numpy(dtype="float32")
+    rpm_yoy_rows = df_rpm.T.pct_change(periods=12, fill_method=None).T.to_numpy(dtype="float32")
 
-    df_ml_vc = df[df["memb_status_letter"] == "M"]["membership_length_years"].clip(upper=8).value_counts(normalize=True)
-    df_ll_vc = df[df["memb_status_letter"] == "L"]["membership_length_years"].clip(upper=8).value_counts(normalize=True)
+    ry_cohorts, rm_cohorts, rpy_cohorts, rpm_cohorts = ([str(year) for year in df.index.year] for df in (df_ry, df_rm, df_rpy, df_rpm))
+    ry_longest, rm_longest, rpy_longest, rpm_longest = (df.columns.max() for df in (df_ry, df_rm, df_rpy, df_rpm))
 
     color_len = len(colors.COLORS)
 
+    # The figures are built from known-good literals and pandas data, so skip plotly's per-property validation, which otherwise dominates building them.
     charts = [
         go.Figure(
+            _validate=False,
             data=[
                 go.Scatter(
+                    _validate=False,
                     x=df_ry.columns,
-                    y=df_ry.loc[year],
+                    y=ry_rows[i],
                     mode="lines+markers",
-                    name=str(year.year),
+                    name=cohort,
                     line={"color": colors.COLORS[i % color_len]},
                 )
-                for i, year in enumerate(df_ry.index)
+                for i, cohort in enumerate(ry_cohorts)
             ],
             layout=go.Layout(
+                _validate=False,
                 title="Member Retention (annual cohort)",
                 xaxis={
                     "title": "Years since joining",
-                    "range": [1, df_ry.columns.max()],
+                    "range": [1, ry_longest],
                 },
                 yaxis={
                     "title": r"# of cohort retained",
@@ -213,20 +274,23 @@ def create_retention(date_selected: str, years: list[int], is_dark_mode: bool) -
             ),
         ),
         go.Figure(
+            _validate=False,
             data=[
-                go.Scatter(
+                go.Scattergl(
+                    _validate=False,
                     x=df_rm.columns,
-                    y=df_rm.loc[year],
+                    y=rm_rows[i],
                     mode="lines",
-                    name=str(year.year),
+                    name=cohort,
                     line={"color": colors.COLORS[i % color_len]},
                 )
-                for i, year in enumerate(df_rm.index)
+                for i, cohort in enumerate(rm_cohorts)
             ],
             layout=go.Layout(
+                _validate=False,
                 xaxis={
                     "title": "Months since joining",
-                    "range": [12, df_rm.columns.max()],
+                    "range": [12, rm_longest],
                 },
                 yaxis={
                     "title": r"# of cohort retained",
@@ -235,20 +299,23 @@ def create_retention(date_selected: str, years: list[int], is_dark_mode: bool) -
             ),
         ),
         go.Figure(
+            _validate=False,
             data=[
                 go.Scatter(
+                    _validate=False,
                     x=df_rpy.columns,
-                    y=df_rpy.loc[year],
+                    y=rpy_rows[i],
                     mode="lines+markers",
-                    name=str(year.year),
+                    name=cohort,
                     line={"color": colors.COLORS[i % color_len]},
                 )
-                for i, year in enumerate(df_rpy.index)
+                for i, cohort in enumerate(rpy_cohorts)
             ],
             layout=go.Layout(
+                _validate=False,
                 xaxis={
                     "title": "Years since joining",
-                    "range": [1, df_rpy.columns.max()],
+                    "range": [1, rpy_longest],
                 },
                 yaxis={
                     "title": r"% of cohort retained",
@@ -258,20 +325,23 @@ def create_retention(date_selected: str, years: list[int], is_dark_mode: bool) -
             ),
         ),
         go.Figure(
+            _validate=False,
             data=[
-                go.Scatter(
+                go.Scattergl(
+                    _validate=False,
                     x=df_rpm.columns,
-                    y=df_rpm.loc[year],
+                    y=rpm_rows[i],
                     mode="lines",
-                    name=str(year.year),
+                    name=cohort,
                     line={"color": colors.COLORS[i % color_len]},
                 )
-                for i, year in enumerate(df_rpm.index)
+                for i, cohort in enumerate(rpm_cohorts)
             ],
             layout=go.Layout(
+                _validate=False,
                 xaxis={
                     "title": "Months since joining",
-                    "range": [12, df_rpm.columns.max()],
+                    "range": [12, rpm_longest],
                 },
                 yaxis={
                     "title": r"% of cohort retained",
@@ -281,18 +351,21 @@ def create_retention(date_selected: str, years: list[int], is_dark_mode: bool) -
             ),
         ),
         go.Figure(
+            _validate=False,
             data=[
                 go.Scatter(
+                    _validate=False,
                     x=df_rpy.index,
                     y=df_rpy[c],
                     mode="lines+markers",
-                    name=c,
+                    name=str(c),
                     line={"color": colors.COLORS[c % color_len]},
                 )
                 for c in df_rpy.columns
                 if c not in [0, 1]
             ],
             layout=go.Layout(
+                _validate=False,
                 title="Nth-Year Retention over Time (join-date cohort)",
                 xaxis={"title": "Cohort (year joined)"},
                 yaxis={
@@ -304,18 +377,21 @@ def create_retention(date_selected: str, years: list[int], is_dark_mode: bool) -
             ),
         ),
         go.Figure(
+            _validate=False,
             data=[
                 go.Scatter(
+                    _validate=False,
                     x=df_rpq.index,
                     y=df_rpq[c],
                     mode="lines+markers",
-                    name=c,
+                    name=str(c),
                     line={"color": colors.COLORS[c % color_len]},
                 )
                 for c in df_rpq.columns
                 if c not in [0, 1]
             ],
             layout=go.Layout(
+                _validate=False,
                 xaxis={"title": "Cohort (by quarter)"},
                 yaxis={
                     "title": r"% of cohort retained",
@@ -326,21 +402,24 @@ def create_retention(date_selected: str, years: list[int], is_dark_mode: bool) -
             ),
         ),
         go.Figure(
+            _validate=False,
             data=[
                 go.Scatter(
+                    _validate=False,
                     x=df_ry.columns,
-                    y=df_ry.loc[year].pct_change(fill_method=None),
+                    y=ry_yoy_rows[i],
                     mode="markers+lines",
-                    name=str(year.year),
+                    name=cohort,
                     line={"color": colors.COLORS[i % color_len]},
                 )
-                for i, year in enumerate(df_ry.index)
+                for i, cohort in enumerate(ry_cohorts)
             ],
             layout=go.Layout(
+                _validate=False,
                 title="Year-Over-Year Retention (annual cohort)",
                 xaxis={
                     "title": "Years since joining",
-                    "range": [2, df_ry.columns.max()],
+                    "range": [2, ry_longest],
                 },
                 yaxis={"title": r"YOY % change", "tickformat": ".0%"},
                 legend={"x": 1, "y": 1},
@@ -348,20 +427,23 @@ def create_retention(date_selected: str, years: list[int], is_dark_mode: bool) -
             ),
         ),
         go.Figure(
+            _validate=False,
             data=[
-                go.Scatter(
+                go.Scattergl(
+                    _validate=False,
                     x=df_rpm.columns,
-                    y=df_rpm.loc[year].pct_change(periods=12, fill_method=None),
+                    y=rpm_yoy_rows[i],
                     mode="lines",
-                    name=str(year.year),
+                    name=cohort,
                     line={"color": colors.COLORS[i % color_len]},
                 )
-                for i, year in enumerate(df_rpm.index)
+                for i, cohort in enumerate(rpm_cohorts)
             ],
             layout=go.Layout(
+                _validate=False,
                 xaxis={
                     "title": "Months since joining",
-                    "range": [24, df_rpm.columns.max()],
+                    "range": [24, rpm_longest],
                 },
                 yaxis={"title": r"YOY % change", "tickformat": ".0%"},
                 legend={"x": 1, "y": 1},
@@ -369,18 +451,21 @@ def create_retention(date_selected: str, years: list[int], is_dark_mode: bool) -
             ),
         ),
         go.Figure(
+            _validate=False,
             data=[
                 go.Bar(
+                    _validate=False,
                     name="Current members",
                     x=df_ml_vc.index,
-                    y=df_ml_vc.values,
-                    text=df_ml_vc.values,
+                    y=df_ml_vc.to_numpy(dtype="float32"),
+                    text=df_ml_vc.to_numpy(dtype="float32"),
                     texttemplate="%{value:.0%}",
                     hovertemplate="%{label}, %{value:.0%}",
                     marker_color=colors.COLORS,
                 ),
             ],
             layout=go.Layout(
+                _validate=False,
                 title="Tenure of Members",
                 xaxis={"title": "Years since joining"},
                 yaxis={"title": r"% of current members", "tickformat": ".0%"},
@@ -388,18 +473,21 @@ def create_retention(date_selected: str, years: list[int], is_dark_mode: bool) -
             ),
         ),
         go.Figure(
+            _validate=False,
             data=[
                 go.Bar(
+                    _validate=False,
                     name="Current members",
                     x=df_ll_vc.index,
-                    y=df_ll_vc.values,
-                    text=df_ll_vc.values,
+                    y=df_ll_vc.to_numpy(dtype="float32"),
+                    text=df_ll_vc.to_numpy(dtype="float32"),
                     texttemplate="%{value:.0%}",
                     hovertemplate="%{label}, %{value:.0%}",
                     marker_color=colors.COLORS,
                 ),
             ],
             layout=go.Layout(
+                _validate=False,
                 xaxis={"title": "Years after joining"},
                 yaxis={"title": r"% of former members", "tickformat": ".0%"},
                 legend={"x": 1, "y": 1},
@@ -407,4 +495,4 @@ def create_retention(date_selected: str, years: list[int], is_dark_mode: bool) -
         ),
     ]
 
-    return [dark_mode.with_template_if_dark(chart, is_dark_mode) for chart in charts]
+    return tuple(dark_mode.with_template_if_dark(chart, is_dark_mode) for chart in charts)
@@ -1,4 +1,4 @@
-import logging
+from functools import lru_cache
 
 import dash
 import dash_bootstrap_components as dbc
@@ -21,7 +21,7 @@ membership_timeline = html.Div(
             [
                 status_filter.status_filter_col(),
                 dbc.Col(
-                    dcc.Dropdown(options=list(column for column in schema.schema.columns), value=["membership_status"], multi=True, id="selected-columns"),
+                    dcc.Dropdown(options=schema.COLUMN_NAMES, value=["membership_status"], multi=True, id="selected-columns"),
                 ),
             ],
             align="center",
@@ -50,24 +50,33 @@ def layout() -> dbc.Row:
     return dbc.Row([dbc.Col(sidebar.sidebar(), width=2), dbc.Col(membership_timeline, width=10)], className="dbc", style={"margin": "1em"})
 
 
-def value_counts_by_date(date_counts: dict) -> dict[str, int]:
-    """Returns data from date_counts in format column>date>value (instead of date>column>value) for use in creating timeline traces"""
-    metrics = {}
-    for date, values in date_counts.items():
-        for value, count in values.value_counts().items():
-            metrics.setdefault(value, {}).setdefault(date, count)
-    return metrics
+def value_counts_by_date(date_counts: dict[str, pd.Series]) -> dict[str, pd.Series]:
+    """Returns data from date_counts in format value>date>count (instead of date>value) for use in creating timeline traces"""
+    date_value_counts = {list_date: scan_lists.observed_value_counts(values) for list_date, values in date_counts.items()}
+    # Lists where no member has a value are left out, since concatenating empty counts is deprecated
+    date_value_counts = {list_date: value_counts for list_date, value_counts in date_value_counts.items() if not value_counts.empty}
+    if not date_value_counts:
+        return {}
+    counts = pd.concat(date_value_counts, names=["list_date", "value"])
+    # sort=False keeps values in order of first appearance, and so each value keeps its trace color
+    return {value: value_counts.droplevel("value") for value, value_counts in counts.groupby(level="value", sort=False, observed=True)}
 
 
-def get_membership_list_metrics(members: dict[str, pd.DataFrame]) -> dict[str, dict[str, pd.Series]]:
-    """Restructure a dictionary of dataframs keyed to dates into a dictionary of pandas column names containing the columns keyed to each date."""
-    logging.info("Calculating metrics for %s membership lists", len(members))
-    columns = {column for memb_list in members.values() for column in memb_list.columns}
+def get_membership_list_metrics(members: dict[str, pd.DataFrame], column: str, selected_statuses: list[str]) -> dict[str, pd.Series]:
+    """Return the named column of each membership list that has it, keyed to list date and limited to members with one of the selected statuses."""
     return {
-        column: {list_date: members[list_date].get(column) for list_date, memb_list in members.items() if column in memb_list.columns} for column in columns
+        list_date: memb_list[column][scan_lists.category_mask(memb_list["membership_status"], selected_statuses)]
+        for list_date, memb_list in members.items()
+        if column in memb_list.columns
     }
 
 
+@lru_cache(maxsize=32)
+def timeline_metrics(column: str, selected_statuses: tuple[str, ...]) -> dict[str, pd.Series]:
+    """Return the counts by date of each value in column across every membership list, computed once per column and set of statuses."""
+    return value_counts_by_date(get_membership_list_metrics(scan_lists.MEMB_LISTS, column, list(selected_statuses)))
+
+
 @callback(
     Output(component_id="timeline", component_property="figure"),
     Input(component_id="selected-columns", component_property="value"),
@@ -76,19 +85,16 @@ def get_membership_list_metrics(members: dict[str, pd.DataFrame]) -> dict[str, d
 )
 def create_timeline(selected_columns: list[str], selected_statuses: list[str], is_dark_mode: bool) -> go.Figure:
     """Update the timeline plotting selected columns."""
-    membership_lists = {
-        date: membership_list.loc[membership_list["membership_status"].isin(selected_statuses)] for date, membership_list in scan_lists.MEMB_LISTS.items()
-    }
-    membership_value_counts = get_membership_list_metrics(membership_lists)
-    selected_metrics = {column: value_counts_by_date(membership_value_counts[column]) for column in selected_columns}
+    statuses = tuple(sorted(selected_statuses))
+    selected_metrics = {column: timeline_metrics(column, statuses) for column in selected_columns}
 
     fig = go.Figure(layout={"title": "Membership Trends Timeline", "yaxis_title": "Members"})
     fig.add_traces(
         [
             go.Scatter(
                 name=value,
-                x=list(timeline_metric[value].keys()),
-                y=list(timeline_metric[value].values()),
+                x=timeline_metric[value].index,
+                y=timeline_metric[value].to_numpy(),
                 mode="lines",
                 marker_color=colors.COLORS[count % len(colors.COLORS)],
             )
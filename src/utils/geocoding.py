@@ -1,34 +1,60 @@
 import hashlib
 import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path, PurePath
 
 import dotenv
 import mapbox
+import numpy as np
 import pandas as pd
 import ratelimit
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 
 config = dotenv.dotenv_values(Path(PurePath(__file__).parents[2], ".env"))
+HAS_MAPBOX_TOKEN = bool(config.get("MAPBOX"))
+GEOCODING_WORKERS = 16
 geocoder = mapbox.Geocoder(access_token=config.get("MAPBOX"))
-tqdm.pandas(unit="comrades", leave=False, desc="Geocoding")
+# Keep one pooled connection per worker so concurrent requests reuse connections instead of reconnecting.
+geocoder.session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=GEOCODING_WORKERS))
 
 
 def persist_to_file(file_name: Path):
+    """Cache results of a function in a json file, keyed by a hash of its string argument. Call save_cache() on the decorated function to write new results."""
+
     def decorator(original_func):
         try:
-            cache = json.load(open(file_name))
+            with open(file_name) as cache_file:
+                cache = json.load(cache_file)
         except (OSError, ValueError):
             cache = {}
+        cache_lock = threading.Lock()
+        unsaved = set()
 
         def new_func(param: str) -> list[float]:
             if not isinstance(param, str):
                 return original_func(param)
             param_hash = hashlib.sha256(param.encode("utf-8")).hexdigest()
             if param_hash not in cache:
-                cache[param_hash] = original_func(param)
-                json.dump(cache, open(file_name, "w"))
+                result = original_func(param)
+                with cache_lock:
+                    cache[param_hash] = result
+                    unsaved.add(param_hash)
             return cache[param_hash]
 
+        def save_cache() -> None:
+            with cache_lock:
+                if not unsaved:
+                    return
+                temp_file_name = Path(f"{file_name}.tmp")
+                with open(temp_file_name, "w") as cache_file:
+                    json.dump(cache, cache_file)
+                os.replace(temp_file_name, file_name)
+                unsaved.clear()
+
+        new_func.save_cache = save_cache
         return new_func
 
     return decorator
@@ -38,26 +64,35 @@ def persist_to_file(file_name: Path):
 @ratelimit.limits(calls=600, period=60)
 def mapbox_geocoder(address: str) -> list[float]:
     """Return a list of lat and long coordinates from a supplied address string, using the Mapbox API"""
-    response = geocoder.forward(address, country=["us"])
-    if "features" not in response.geojson():
+    geojson = geocoder.forward(address, country=["us"]).geojson()
+    if "features" not in geojson:
         return [0, 0]
-    return response.geojson()["features"][0]["center"]
+    return geojson["features"][0]["center"]
 
 
 @persist_to_file(Path(PurePath(__file__).parents[2], "geocoding.json"))
 def get_geocoding(address: str) -> list[float]:
     """Return a list of lat and long coordinates from a supplied address string, either from cache or mapbox_geocoder"""
-    if not isinstance(address, str) or "MAPBOX" not in config:
+    if not isinstance(address, str) or not HAS_MAPBOX_TOKEN:
         return [0, 0]
     return mapbox_geocoder(address)
 
 
 def add_coordinates(df: pd.DataFrame) -> pd.DataFrame:
+    """Add lon and lat columns, geocoding each distinct address once on a pool of threads that share the Mapbox rate limit."""
     if "lat" in df:
         return df
 
-    df[["lon", "lat"]] = pd.DataFrame(
-        (df.address1 + ", " + df.city + ", " + df.state + " " + df.zip).progress_apply(get_geocoding).tolist(),
-        index=df.index,
-    )
+    addresses = df.address1.str.cat([df.city, df.state.str.cat(df.zip, sep=" ")], sep=", ")
+    unique_addresses = addresses.dropna().unique()
+    try:
+        with ThreadPoolExecutor(max_workers=GEOCODING_WORKERS) as executor:
+            results = tqdm(executor.map(get_geocoding, unique_addresses), total=len(unique_addresses), unit="comrades", leave=False, desc="Geocoding")
+            coordinates = dict(zip(unique_addresses, results, strict=True))
+    finally:
+        get_geocoding.save_cache()
+
+    lon_lat = np.array([coordinates.get(address, [0, 0]) for address in addresses], dtype="float64").reshape(-1, 2)
+    df["lon"] = lon_lat[:, 0]
+    df["lat"] = lon_lat[:, 1]
     return df
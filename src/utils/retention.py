@@ -1,10 +1,10 @@
 """Provides utility functions for calculating membership retention of various cohorts with varying levels of resolution"""
 
+import numpy as np
 import pandas as pd
 
 
 class Columns:
-    COUNTING_COLUMN = "zip"
     JOIN_YEAR = "join_year"
     JOIN_QUARTER = "join_quarter"
     MEMBERSHIP_LENGTH_YEARS = "membership_length_years"
@@ -16,14 +16,8 @@ class Columns:
 
 
 def retention_pivot(df: pd.DataFrame, join_interval: str, membership_length: str) -> pd.DataFrame:
-    """Return the transposed pivot table to be used in other retention functions"""
-    return df.pivot_table(
-        index=[join_interval],
-        columns=[membership_length],
-        values=Columns.COUNTING_COLUMN,
-        fill_value=0,
-        aggfunc=len,
-    ).transpose()[::-1]
+    """Return the transposed pivot table of member counts to be used in other retention functions"""
+    return df.groupby([join_interval, membership_length]).size().unstack(fill_value=0).transpose()[::-1]
 
 
 def retention_origin(df: pd.DataFrame, join_year: str, length: str) -> pd.DataFrame:
@@ -77,3 +71,10 @@ def retention_pct_quarter(df: pd.DataFrame):
     return (
         (pivot.cumsum() / pivot.sum())[::-1].transpose().replace(to_replace=0, value=None).infer_objects(copy=False).interpolate(limit=1, limit_area="inside")
     )
+
+
+def tenure_shares(lengths: pd.Series, cap: int = 8) -> pd.Series:
+    """Return the share of members at each whole year of membership length, with lengths past cap counted as cap and missing lengths ignored"""
+    counts = np.bincount(lengths.dropna().to_numpy(dtype="int64").clip(0, cap), minlength=cap + 1)
+    tenures = np.flatnonzero(counts)
+    return pd.Series(counts[tenures] / counts.sum(), index=tenures)
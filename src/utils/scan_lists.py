@@ -1,12 +1,19 @@
 """Parse all membership lists into pandas dataframes for display on dashboard"""
 
+import datetime
+import json
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from glob import glob
 from pathlib import Path, PurePath
-from zipfile import ZipFile
+from zipfile import BadZipFile, ZipFile
 
 import dotenv
+import numpy as np
 import pandas as pd
+import pyarrow as pa
 from tqdm import tqdm
 
 from src.utils.geocoding import add_coordinates
@@ -14,6 +21,9 @@ from src.utils.geocoding import add_coordinates
 config = dotenv.dotenv_values(Path(PurePath(__file__).parents[2], ".env"))
 BRANCH_ZIPS_PATH = Path(PurePath(__file__).parents[2], "branch_zips.csv")
 MEMBER_LIST_NAME = config.get("LIST", "fake_membership_list")
+CACHE_ROOT = Path(os.environ.get("CACHE_DIR", config.get("CACHE_DIR", Path(PurePath(__file__).parents[2], "cache"))))
+# Bump whenever cleaning changes the cached lists, so every list is cleaned again on the next startup.
+CACHE_VERSION = 1
 
 logging.basicConfig(level=logging.WARNING, format="%(asctime)s : %(levelname)s : %(message)s")
 
@@ -51,11 +61,20 @@ class ListColumnRules:
         "zip": ["billing_zip", "mailing_zip"],
     }
     FIELD_UPGRADE_PAIRS = {old: new for new, old_names in FIELD_UPGRADE_PATHS.items() for old in old_names}
+    FIELD_LOWERCASE = ["membership_status", "membership_type"]
+    FIELD_CATEGORICAL = ["membership_type", "membership_status", "race", "union_member", "accommodations", "state"]
+    FIELD_BOOLEAN = ["do_not_call", "p2ptext_optout"]
+    FIELD_REQUIRED = ["first_name", "last_name", "best_phone", "email", "membership_type", "membership_status", "union_member", "race"]
+    BOOLEAN_VALUES = {"true": True, "t": True, "yes": True, "1": True, "false": False, "f": False, "no": False, "0": False}
 
 
-def membership_length_months(join_date: pd.Series, xdate: pd.Series):
-    """Calculate how many months are between the supplied dates."""
-    return 12 * (xdate.dt.year - join_date.dt.year) + (xdate.dt.month - join_date.dt.month)
+def membership_length_months(join_date: pd.Series, xdate: pd.Series) -> pd.Series:
+    """Calculate how many months are between the supplied dates, using month-resolution numpy datetimes."""
+    months = xdate.to_numpy(dtype="datetime64[M]") - join_date.to_numpy(dtype="datetime64[M]")
+    missing = np.isnat(months)
+    if missing.any():
+        return pd.Series(np.where(missing, np.nan, months.astype("int64")), index=join_date.index)
+    return pd.Series(months.astype("int32"), index=join_date.index)
 
 
 def membership_length_years(join_date: pd.Series, xdate: pd.Series) -> pd.Series:
@@ -77,12 +96,22 @@ def add_family_members(df: pd.DataFrame) -> pd.DataFrame:
 
 
 def update_fields(df: pd.DataFrame, field_upgrade_pairs: dict[str, str], field_drop: list[str]) -> pd.DataFrame:
+    """Rename old column names to their current equivalents and drop obsolete columns in a single pass each."""
+    renames = {}
     for old_name, new_name in field_upgrade_pairs.items():
-        if new_name not in df.columns and old_name in df.columns:
-            df[new_name] = df[old_name]
-        df.drop(columns=old_name, inplace=True, errors="ignore")
-    for field_name in field_drop:
-        df.drop(columns=field_name, inplace=True, errors="ignore")
+        if old_name in df.columns and new_name not in df.columns and new_name not in renames.values():
+            renames[old_name] = new_name
+    obsolete = [column for column in df.columns if (column in field_upgrade_pairs and column not in renames) or column in field_drop]
+    df.drop(columns=obsolete, inplace=True)
+    df.rename(columns=renames, inplace=True)
+    return df
+
+
+def lowercase_fields(df: pd.DataFrame, field_lowercase: list[str]) -> pd.DataFrame:
+    """Lowercase each listed column once so later replacements only need lowercase keys."""
+    for field_name in field_lowercase:
+        if field_name in df.columns:
+            df[field_name] = df[field_name].str.lower()
     return df
 
 
@@ -92,6 +121,18 @@ def format_fields(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def booleanize_fields(df: pd.DataFrame, field_boolean: list[str]) -> pd.DataFrame:
+    """Store each listed column as a nullable boolean, mapping any text values onto True and False."""
+    for field_name in field_boolean:
+        if field_name not in df.columns:
+            continue
+        values = df[field_name]
+        if values.dtype == object:
+            values = values.astype(str).str.strip().str.lower().map(ListColumnRules.BOOLEAN_VALUES)
+        df[field_name] = values.astype("boolean")
+    return df
+
+
 def handle_union_member(df: pd.DataFrame) -> pd.DataFrame:
     if "union_member" not in df.columns:
         return df
@@ -102,11 +143,19 @@ def handle_union_member(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def parse_dates(dates: pd.Series) -> pd.Series:
+    """Parse a column of dates with the vectorized ISO 8601 parser, only inferring the format of each element if that fails."""
+    try:
+        return pd.to_datetime(dates, format="ISO8601")
+    except ValueError:
+        return pd.to_datetime(dates, format="mixed")
+
+
 def process_dates(df: pd.DataFrame) -> pd.DataFrame:
-    df["join_date"] = pd.to_datetime(df.join_date, format="mixed")
-    df["join_year"] = pd.PeriodIndex(df.join_date, freq="Y").to_timestamp()
+    df["join_date"] = parse_dates(df.join_date)
+    df["join_year"] = pd.Series(df.join_date.to_numpy(dtype="datetime64[Y]").astype("datetime64[ns]"), index=df.index)
     df["join_quarter"] = pd.PeriodIndex(df.join_date, freq="Q").to_timestamp()
-    df["xdate"] = pd.to_datetime(df.xdate, format="mixed")
+    df["xdate"] = parse_dates(df.xdate)
     return df
 
 
@@ -117,35 +166,75 @@ def calculate_membership_length(df: pd.DataFrame) -> pd.DataFrame:
 
 
 def format_membership_status(df: pd.DataFrame) -> pd.DataFrame:
-    df["membership_status"] = df.membership_status.replace("expired", "lapsed").str.lower()
+    df["membership_status"] = df.membership_status.replace("expired", "lapsed")
     df["memb_status_letter"] = df.membership_status.replace({"member in good standing": "M", "member": "M", "lapsed": "L"})
     return df
 
 
 def format_membership_type(df: pd.DataFrame) -> pd.DataFrame:
-    df["membership_type"] = df.membership_type.replace("annual", "yearly").str.lower()
+    df["membership_type"] = df.membership_type.replace("annual", "yearly")
     df["membership_type"] = df.membership_type.where(df.xdate != "2099-11-01", "lifetime")
     return df
 
 
+def add_missing_fields(df: pd.DataFrame, field_required: list[str]) -> pd.DataFrame:
+    """Add an empty column for each listed field that an older list lacks, so pages can rely on those columns existing."""
+    missing_fields = [field_name for field_name in field_required if field_name not in df.columns]
+    if missing_fields:
+        df = df.assign(**{field_name: pd.Series(np.nan, index=df.index, dtype=object) for field_name in missing_fields})
+    return df
+
+
+def categorize_fields(df: pd.DataFrame, field_categorical: list[str]) -> pd.DataFrame:
+    """Store low-cardinality text columns as pandas categoricals to save memory and speed up filtering and counting."""
+    return df.astype({field_name: "category" for field_name in field_categorical if field_name in df.columns})
+
+
+def category_mask(values: pd.Series, selected: list[str] | tuple[str, ...]) -> np.ndarray:
+    """Return a boolean mask of the categorical values that are in selected, comparing the integer codes rather than hashing every value."""
+    wanted = np.flatnonzero(values.cat.categories.isin(selected))
+    return np.isin(values.cat.codes.to_numpy(), wanted)
+
+
+def observed_value_counts(values: pd.Series) -> pd.Series:
+    """Count each value that occurs in values, most common first.
+
+    Ties stay in order of first appearance, as value_counts orders plain object columns. value_counts would order tied categoricals by category instead.
+    """
+    counts = values.value_counts(sort=False)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes = values.cat.codes.to_numpy()
+        counts = counts.iloc[pd.unique(codes[codes >= 0])]
+    return counts[counts > 0].sort_values(ascending=False, kind="stable")
+
+
 def data_cleaning(df: pd.DataFrame) -> pd.DataFrame:
     df.columns = df.columns.str.lower()
     df = add_family_members(df)
     df = update_fields(df, ListColumnRules.FIELD_UPGRADE_PAIRS, ListColumnRules.FIELD_DROP)
+    df = lowercase_fields(df, ListColumnRules.FIELD_LOWERCASE)
     df = format_fields(df)
+    df = booleanize_fields(df, ListColumnRules.FIELD_BOOLEAN)
     df = handle_union_member(df)
     df = process_dates(df)
     df = calculate_membership_length(df)
     df = format_membership_status(df)
     df = format_membership_type(df)
     df = add_coordinates(df)
+    df = add_missing_fields(df, ListColumnRules.FIELD_REQUIRED)
+    df = categorize_fields(df, ListColumnRules.FIELD_CATEGORICAL)
     df.set_index("actionkit_id", inplace=True)
     return df
 
 
+def date_from_filename(filename: str) -> datetime.date:
+    """Parse the date suffix (YYYYMMDD) from a membership list file name such as maine_membership_list_20240101.zip."""
+    return datetime.datetime.strptime(PurePath(filename).stem.rsplit("_", 1)[-1], "%Y%m%d").date()
+
+
 def scan_memb_list_from_csv(csv_file_data) -> pd.DataFrame:
     """Convert the provided csv data into a pandas dataframe."""
-    return pd.read_csv(csv_file_data, dtype={"zip": str}, header=0)
+    return pd.read_csv(csv_file_data, dtype={"zip": str}, header=0, engine="pyarrow")
 
 
 def scan_memb_list_from_zip(zip_path: str, list_name: str) -> pd.DataFrame:
@@ -155,20 +244,34 @@ def scan_memb_list_from_zip(zip_path: str, list_name: str) -> pd.DataFrame:
             return scan_memb_list_from_csv(memb_list_csv)
 
 
-def scan_all_membership_lists(list_name: str) -> dict[str, pd.DataFrame]:
-    """Scan all zip files and call scan_memb_list_from_zip on each, returning the results."""
-    memb_lists = {}
-    logging.info("Scanning zipped membership lists in %s/.", list_name)
+def find_membership_list_zips(list_name: str) -> dict[str, str]:
+    """Return the path of each membership list zip file keyed by the ISO date in its file name, skipping files without a date."""
+    logging.info("Finding zipped membership lists in %s/.", list_name)
     files = sorted(glob(str(Path(PurePath(__file__).parents[2], list_name, "**/*.zip")), recursive=True), reverse=True)
+    zip_files = {}
     for zip_file in files:
-        filename = Path(zip_file).name
         try:
-            date_from_filename = str(PurePath(filename).stem).split("_")[-1]
-            list_date_iso = pd.to_datetime(date_from_filename, format="%Y%m%d").date().isoformat()
-            memb_lists[list_date_iso] = scan_memb_list_from_zip(str(Path(zip_file).absolute()), list_name)
-        except (IndexError, ValueError):
-            logging.warning("Could not extract list from %s. Skipping file.", filename)
-    logging.info("Found %s zipped membership lists.", len(memb_lists))
+            zip_files[date_from_filename(zip_file).isoformat()] = str(Path(zip_file).absolute())
+        except ValueError:
+            logging.warning("Could not extract list from %s. Skipping file.", Path(zip_file).name)
+    return zip_files
+
+
+def scan_zip_file(zip_file: str, list_name: str) -> pd.DataFrame | None:
+    """Return the contents of a zip file, or None if it cannot be read."""
+    try:
+        return scan_memb_list_from_zip(zip_file, list_name)
+    except (BadZipFile, KeyError, ValueError):
+        logging.warning("Could not extract list from %s. Skipping file.", Path(zip_file).name)
+        return None
+
+
+def scan_all_membership_lists(zip_files: dict[str, str], list_name: str) -> dict[str, pd.DataFrame]:
+    """Scan the provided zip files (keyed by list date) concurrently and call scan_memb_list_from_zip on each, returning the results."""
+    with ThreadPoolExecutor() as executor:
+        scanned = executor.map(partial(scan_zip_file, list_name=list_name), zip_files.values())
+        memb_lists = {list_date: memb_list for list_date, memb_list in zip(zip_files, scanned, strict=True) if memb_list is not None}
+    logging.info("Scanned %s zipped membership lists.", len(memb_lists))
     return memb_lists
 
 
@@ -178,23 +281,111 @@ def branch_name_from_zip_code(zip_code: str, branch_zips: pd.DataFrame) -> str:
     return branch_zips.loc[cleaned_zip_code, "branch"] if cleaned_zip_code in branch_zips.index else ""
 
 
+def branch_names_from_zip_codes(zip_codes: pd.Series, branch_lookup: dict[str, str]) -> pd.Series:
+    """Vectorized branch_name_from_zip_code: map each zip code in zip_codes to its branch name in branch_lookup, or an empty string if not found"""
+    cleaned_zip_codes = zip_codes.astype(str).str.zfill(5).str.split("-").str[0]
+    return cleaned_zip_codes.map(branch_lookup).fillna("")
+
+
 def tagged_with_branches(memb_lists: dict[str, pd.DataFrame], branch_zip_path: Path) -> dict[str, pd.DataFrame]:
-    """Add branch column to each membership list, filling with data cross-referenced from a provided csv via branch_name_from_zip_code()"""
+    """Add branch column to each membership list, filling with data cross-referenced from a provided csv via branch_names_from_zip_codes()"""
     branch_zips = pd.read_csv(branch_zip_path, dtype={"zip": str}, index_col="zip")
+    branch_lookup = branch_zips["branch"].to_dict()
     for date, memb_list in memb_lists.items():
         logging.debug(
             "Tagging %s membership list with branches based on current zip code assignments.",
             date,
         )
-        memb_list["branch"] = memb_list["zip"].apply(branch_name_from_zip_code, branch_zips=branch_zips)
+        memb_list["branch"] = branch_names_from_zip_codes(memb_list["zip"], branch_lookup)
     return memb_lists
 
 
+def cached_list_path(list_date: str, cache_path: Path) -> Path:
+    """Return the path of the parquet file that caches the cleaned list for list_date."""
+    return Path(cache_path, f"{list_date}.parquet")
+
+
+def get_cached_lists(list_dates: list[str], cache_path: Path) -> dict[str, pd.DataFrame]:
+    """Return the cleaned membership lists previously saved to cache_path for any of the provided list dates."""
+    cached_lists = {}
+    for list_date in list_dates:
+        try:
+            cached_list = pd.read_parquet(cached_list_path(list_date, cache_path))
+        except (OSError, ValueError):
+            continue
+        # Parquet cannot keep the dtype of an all-null categorical, so reapply categories on load.
+        cached_lists[list_date] = categorize_fields(cached_list, ListColumnRules.FIELD_CATEGORICAL)
+    return cached_lists
+
+
+def write_cached_lists(memb_lists: dict[str, pd.DataFrame], cache_path: Path) -> None:
+    """Save each cleaned membership list to its own zstd-compressed parquet file in cache_path, replacing any existing file atomically."""
+    cache_path.mkdir(parents=True, exist_ok=True)
+    for list_date, memb_list in memb_lists.items():
+        list_path = cached_list_path(list_date, cache_path)
+        temp_path = Path(f"{list_path}.tmp")
+        memb_list.to_parquet(temp_path, compression="zstd")
+        os.replace(temp_path, list_path)
+
+
+def zip_file_signature(zip_file: str) -> list[int]:
+    """Return the modification time and size of zip_file, which change whenever the file is replaced."""
+    zip_stat = os.stat(zip_file)
+    return [zip_stat.st_mtime_ns, zip_stat.st_size]
+
+
+def get_cache_manifest(cache_path: Path) -> dict[str, list[int]]:
+    """Return the zip_file_signature of the zip file each cached list was cleaned from, keyed by list date.
+
+    The manifest is ignored if it was written for a different CACHE_VERSION.
+    """
+    try:
+        with open(Path(cache_path, "manifest.json")) as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get("version") != CACHE_VERSION:
+        return {}
+    return manifest.get("lists", {})
+
+
+def write_cache_manifest(manifest: dict[str, list[int]], cache_path: Path) -> None:
+    """Save the signatures of the zip files behind the cached lists, replacing any existing manifest atomically."""
+    cache_path.mkdir(parents=True, exist_ok=True)
+    manifest_path = Path(cache_path, "manifest.json")
+    temp_path = Path(f"{manifest_path}.tmp")
+    with open(temp_path, "w") as manifest_file:
+        json.dump({"version": CACHE_VERSION, "lists": manifest}, manifest_file)
+    os.replace(temp_path, manifest_path)
+
+
 def get_membership_lists(list_name: str, branch_lookup_path: Path) -> dict[str, pd.DataFrame]:
-    """Return all membership lists, preferring pickled lists for speed."""
-    scanned_lists = scan_all_membership_lists(list_name)
-    logging.info("Cleaning and standardizing data for %s lists.", len(scanned_lists))
-    memb_lists = {k_date: data_cleaning(memb_list) for k_date, memb_list in tqdm(scanned_lists.items(), unit="list", desc="Scanning Zip Files")}
+    """Return all membership lists, preferring cached lists for speed."""
+    zip_files = find_membership_list_zips(list_name)
+    zip_signatures = {k_date: zip_file_signature(zip_file) for k_date, zip_file in zip_files.items()}
+    cache_path = Path(CACHE_ROOT, list_name)
+    manifest = get_cache_manifest(cache_path)
+    cached_dates = [k_date for k_date in zip_files if manifest.get(k_date) == zip_signatures[k_date] and cached_list_path(k_date, cache_path).is_file()]
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # Read cached lists in the background while the uncached zip files are scanned.
+        cached_future = executor.submit(get_cached_lists, cached_dates, cache_path)
+        new_lists = scan_all_membership_lists({k_date: zip_file for k_date, zip_file in zip_files.items() if k_date not in cached_dates}, list_name)
+        cached_lists = cached_future.result()
+    unreadable_dates = [k_date for k_date in cached_dates if k_date not in cached_lists]
+    if unreadable_dates:
+        logging.warning("Could not read %s cached lists. Rescanning their zip files.", len(unreadable_dates))
+        new_lists.update(scan_all_membership_lists({k_date: zip_files[k_date] for k_date in unreadable_dates}, list_name))
+    logging.info("Cleaning and standardizing data for %s new lists.", len(new_lists))
+    cleaned_lists = {k_date: data_cleaning(memb_list) for k_date, memb_list in tqdm(new_lists.items(), unit="list", desc="Scanning Zip Files")}
+    try:
+        write_cached_lists(cleaned_lists, cache_path)
+        if cleaned_lists:
+            write_cache_manifest({**manifest, **{k_date: zip_signatures[k_date] for k_date in cleaned_lists}}, cache_path)
+    except (OSError, pa.ArrowException, TypeError, ValueError) as e:
+        # Parquet cannot store every object column, such as one mixing numbers and strings, so serialization errors are tolerated too.
+        logging.warning("Could not write cached lists to %s. They will be cleaned again on the next startup. %s", cache_path, e)
+    memb_lists = {k_date: cached_lists.get(k_date, cleaned_lists.get(k_date)) for k_date in zip_files}
+    memb_lists = {k_date: memb_list for k_date, memb_list in memb_lists.items() if memb_list is not None}
     if BRANCH_ZIPS_PATH.is_file():
         logging.info("Tagging each membership list based on current branch zip code assignments.")
         memb_lists = tagged_with_branches(memb_lists, branch_lookup_path)
@@ -202,3 +393,5 @@ def get_membership_lists(list_name: str, branch_lookup_path: Path) -> dict[str,
 
 
 MEMB_LISTS = get_membership_lists(MEMBER_LIST_NAME, BRANCH_ZIPS_PATH)
+# Shared stand-in for a list date that isn't in MEMB_LISTS; read it, never modify it.
+EMPTY_LIST = pd.DataFrame()
@@ -471,3 +471,5 @@ schema = DataFrameSchema(
     title="DSA Membership List",
     description=None,
 )
+
+COLUMN_NAMES = list(schema.columns)
@@ -0,0 +1,15 @@
+"""Keep the cleaned list cache written on import of scan_lists out of the working tree during tests"""
+
+import os
+import shutil
+import tempfile
+
+import pytest
+
+
+def pytest_configure(config: pytest.Config):
+    os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="membership_cache_")
+
+
+def pytest_unconfigure(config: pytest.Config):
+    shutil.rmtree(os.environ.pop("CACHE_DIR"), ignore_errors=True)
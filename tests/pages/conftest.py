@@ -0,0 +1,20 @@
+"""Provide pytest fixtures for the dashboard page modules"""
+
+import importlib
+from types import ModuleType
+
+import pytest
+
+import src.app  # noqa: F401 Creating the Dash app registers the page modules.
+
+
+@pytest.fixture
+def graphs() -> ModuleType:
+    """Provides the graphs page module as registered by Dash"""
+    return importlib.import_module("pages.graphs")
+
+
+@pytest.fixture
+def timeline() -> ModuleType:
+    """Provides the timeline page module as registered by Dash"""
+    return importlib.import_module("pages.timeline")
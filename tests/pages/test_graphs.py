@@ -0,0 +1,26 @@
+"""Perform testing to ensure the graphs page compares membership lists correctly"""
+
+from types import ModuleType
+
+import pandas as pd
+
+from src.components import colors
+
+
+def test_create_chart_with_empty_compare_counts(graphs: ModuleType):
+    """Ensure a selected compare list whose column is entirely null still shows compare colors and deltas"""
+    chart = graphs.create_chart(pd.Series([1], index=["yes"]), pd.Series(dtype="int64"), "Union", "Members", True, True)
+    assert list(chart.data[1].text) == ["1 (+1)"]
+    assert chart.data[1].marker.color == colors.COMPARE_COLORS[1]
+
+
+def test_create_chart_without_compare(graphs: ModuleType):
+    """Ensure charts without a compare list show plain counts"""
+    chart = graphs.create_chart(pd.Series([1], index=["yes"]), pd.Series(dtype="int64"), "Union", "Members", True, False)
+    assert list(chart.data[1].text) == ["1"]
+
+
+def test_create_graphs_with_all_null_compare_column(graphs: ModuleType):
+    """Ensure the union chart shows deltas against a compare list that has no union membership data"""
+    union_chart = graphs.create_graphs("2023-11-15", "2021-01-15", True)[2]
+    assert all("(" in label for label in union_chart.data[1].text)
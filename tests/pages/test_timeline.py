@@ -0,0 +1,18 @@
+"""Perform testing to ensure the timeline page keeps its traces in a stable order"""
+
+from types import ModuleType
+
+import pandas as pd
+
+
+def test_value_counts_by_date_trace_order(timeline: ModuleType):
+    """Ensure tied values keep their order of first appearance rather than category order, so each trace keeps its color"""
+    dues = pd.CategoricalDtype(["income-based", "monthly", "yearly"])
+    value_counts = timeline.value_counts_by_date(
+        {
+            "2024-01-01": pd.Series(["yearly", "monthly"], dtype=dues),
+            "2023-01-01": pd.Series(["monthly", "yearly", "monthly"], dtype=dues),
+        }
+    )
+    assert list(value_counts) == ["yearly", "monthly"]
+    assert value_counts["monthly"].to_dict() == {"2024-01-01": 1, "2023-01-01": 2}
@@ -4,7 +4,7 @@ from pathlib import Path
 
 import pandas as pd
 
-from src.utils.scan_lists import tagged_with_branches, branch_name_from_zip_code
+from src.utils.scan_lists import tagged_with_branches, branch_name_from_zip_code, branch_names_from_zip_codes
 
 TEST_BRANCH_ZIP_CSV = Path("tests/utils/assets/fake_branch_zips.csv")
 
@@ -16,6 +16,14 @@ def test_branch_name_from_zip_code():
     assert branch_name_from_zip_code("04011", branch_zips) == "Midcoast"
 
 
+def test_branch_names_from_zip_codes():
+    """Ensure branch_names_from_zip_codes matches branch_name_from_zip_code for padded, +4, and unknown zip codes"""
+    branch_zips = pd.read_csv(TEST_BRANCH_ZIP_CSV, dtype={"zip": str}, index_col="zip")
+    zip_codes = pd.Series(["04102", "4011", "04282-0013", "99999"])
+    expected = [branch_name_from_zip_code(zip_code, branch_zips) for zip_code in zip_codes]
+    assert branch_names_from_zip_codes(zip_codes, branch_zips["branch"].to_dict()).tolist() == expected == ["Portland", "Midcoast", "Central", ""]
+
+
 def test_branch_zip_tagging(late_2023_list_clean: pd.DataFrame):
     """Load a branch_zips file and attempt to apply it to test data, including for members whose zips are +4"""
     tagged_list = tagged_with_branches({"2024-01-01": late_2023_list_clean}, TEST_BRANCH_ZIP_CSV)
@@ -2,7 +2,7 @@
 
 import pandas as pd
 
-from src.utils.scan_lists import data_cleaning, format_zip_code
+from src.utils.scan_lists import category_mask, data_cleaning, format_zip_code
 
 
 def test_mailing_to_unified_address_conversion(late_2023_list: pd.DataFrame) -> None:
@@ -39,6 +39,13 @@ def test_expired_status_conversion(early_2021_list: pd.DataFrame):
     assert person["membership_status"] == "lapsed"
 
 
+def test_uppercase_expired_status_conversion(early_2021_list: pd.DataFrame):
+    """Ensure members with an uppercase expired status have this changed to lapsed"""
+    early_2021_list["membership_status"] = early_2021_list["membership_status"].str.upper()
+    person = data_cleaning(early_2021_list).loc[222251]
+    assert person["membership_status"] == "lapsed"
+
+
 def test_lifetime_type_conversion(early_2021_list: pd.DataFrame):
     """Ensure members with expiration date of 2099 have membership_type set to lifetime"""
     person = data_cleaning(early_2021_list).loc[28855]
@@ -66,3 +73,33 @@ def test_membership_length_months(late_2022_list: pd.DataFrame):
 def test_format_zip_code():
     """Check whether format_zip_code pads zip codes with <4 digits with leading zeros"""
     assert format_zip_code(4011) == "04011"
+
+
+def test_categorical_columns(late_2023_list: pd.DataFrame):
+    """Ensure low-cardinality text columns are stored as categoricals after cleaning"""
+    df = data_cleaning(late_2023_list)
+    assert isinstance(df["membership_status"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["membership_type"].dtype, pd.CategoricalDtype)
+
+
+def test_category_mask(late_2023_list: pd.DataFrame):
+    """Ensure the categorical code mask selects the same members as isin"""
+    statuses = data_cleaning(late_2023_list)["membership_status"]
+    selected = ["member in good standing", "lapsed"]
+    assert (category_mask(statuses, selected) == statuses.isin(selected).to_numpy()).all()
+    assert not category_mask(statuses, []).any()
+
+
+def test_boolean_columns(late_2022_list: pd.DataFrame):
+    """Ensure opt-out flags are stored as nullable booleans after cleaning"""
+    df = data_cleaning(late_2022_list)
+    assert df["do_not_call"].dtype == "boolean"
+    assert not df["p2ptext_optout"].any()
+
+
+def test_missing_required_columns(early_2020_list: pd.DataFrame):
+    """Ensure columns the pages rely on are added, empty, to lists exported before they existed"""
+    assert "best_phone" not in early_2020_list.columns
+    df = data_cleaning(early_2020_list)
+    assert df["best_phone"].isna().all()
+    assert isinstance(df["race"].dtype, pd.CategoricalDtype)
@@ -0,0 +1,26 @@
+"""Perform testing to ensure geocoding results are cached to disk"""
+
+import json
+from pathlib import Path
+
+from src.utils.geocoding import persist_to_file
+
+
+def test_persist_to_file(tmp_path: Path):
+    """Ensure cached results are only written when save_cache is called, and are reloaded by a new decorator"""
+    cache_path = tmp_path / "geocoding.json"
+
+    @persist_to_file(cache_path)
+    def fake_geocoder(address: str) -> list[float]:
+        return [len(address), 0]
+
+    assert fake_geocoder("1 Main St") == [9, 0]
+    assert not cache_path.exists()
+    fake_geocoder.save_cache()
+    assert list(json.loads(cache_path.read_text()).values()) == [[9, 0]]
+
+    @persist_to_file(cache_path)
+    def failing_geocoder(address: str) -> list[float]:
+        raise AssertionError("Cached address should not be geocoded again")
+
+    assert failing_geocoder("1 Main St") == [9, 0]
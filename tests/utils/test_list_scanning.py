@@ -0,0 +1,92 @@
+"""Perform testing to ensure membership list files are discovered and dated correctly"""
+
+import json
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from src.utils import scan_lists
+
+from src.utils.scan_lists import (
+    BRANCH_ZIPS_PATH,
+    CACHE_VERSION,
+    date_from_filename,
+    get_cache_manifest,
+    get_cached_lists,
+    get_membership_lists,
+    observed_value_counts,
+    write_cache_manifest,
+    write_cached_lists,
+    zip_file_signature,
+)
+
+
+def test_date_from_filename():
+    """Ensure the list date is parsed from the suffix of a zip file name"""
+    assert date_from_filename("maine_membership_list_20240101.zip") == date(2024, 1, 1)
+    assert date_from_filename("fake_membership_list_20231115.zip") == date(2023, 11, 15)
+
+
+def test_date_from_filename_without_date():
+    """Ensure zip files without a date suffix are rejected"""
+    with pytest.raises(ValueError):
+        date_from_filename("maine_membership_list.zip")
+
+
+def test_cached_lists_round_trip(tmp_path: Path, late_2023_list_clean: pd.DataFrame):
+    """Ensure cleaned lists written to the parquet cache are read back unchanged"""
+    write_cached_lists({"2024-01-01": late_2023_list_clean}, tmp_path)
+    pd.testing.assert_frame_equal(get_cached_lists(["2024-01-01"], tmp_path)["2024-01-01"], late_2023_list_clean)
+
+
+def test_missing_cached_lists(tmp_path: Path):
+    """Ensure lists without a cache file are left out"""
+    assert get_cached_lists(["2024-01-01"], tmp_path) == {}
+
+
+def test_zip_file_signature_changes_with_file(tmp_path: Path):
+    """Ensure a replaced zip file no longer matches the signature recorded in the cache manifest"""
+    zip_path = tmp_path / "fake_membership_list_20240101.zip"
+    zip_path.write_bytes(b"old list")
+    write_cache_manifest({"2024-01-01": zip_file_signature(str(zip_path))}, tmp_path)
+    assert get_cache_manifest(tmp_path)["2024-01-01"] == zip_file_signature(str(zip_path))
+    zip_path.write_bytes(b"replacement list")
+    assert get_cache_manifest(tmp_path)["2024-01-01"] != zip_file_signature(str(zip_path))
+
+
+def test_cache_manifest_from_other_version(tmp_path: Path):
+    """Ensure a manifest written for a different cache version is ignored so every list is cleaned again"""
+    (tmp_path / "manifest.json").write_text(json.dumps({"version": CACHE_VERSION + 1, "lists": {"2024-01-01": [1, 2]}}))
+    assert get_cache_manifest(tmp_path) == {}
+    (tmp_path / "manifest.json").write_text(json.dumps({"2024-01-01": [1, 2]}))
+    assert get_cache_manifest(tmp_path) == {}
+
+
+def test_unwritable_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture):
+    """Ensure lists are still returned with a warning when the cache folder cannot be written"""
+    blocked_root = tmp_path / "cache"
+    blocked_root.write_text("a file where the cache folder should be")
+    monkeypatch.setattr(scan_lists, "CACHE_ROOT", blocked_root)
+    assert get_membership_lists("fake_membership_list", BRANCH_ZIPS_PATH)
+    assert "Could not write cached lists" in caplog.text
+
+
+def test_observed_value_counts_ties():
+    """Ensure categorical counts skip unseen categories and break ties by first appearance, like plain object columns"""
+    values = ["yearly", "monthly", None, "yearly", "monthly", "income-based"]
+    categorical_counts = observed_value_counts(pd.Series(values, dtype=pd.CategoricalDtype(["income-based", "monthly", "suspended", "yearly"])))
+    object_counts = observed_value_counts(pd.Series(values))
+    assert categorical_counts.index.tolist() == object_counts.index.tolist() == ["yearly", "monthly", "income-based"]
+    assert categorical_counts.tolist() == object_counts.tolist() == [2, 2, 1]
+
+
+def test_unserializable_cached_list(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture):
+    """Ensure lists are still returned with a warning when a cleaned list cannot be written to parquet"""
+    monkeypatch.setattr(scan_lists, "CACHE_ROOT", tmp_path)
+    monkeypatch.setattr(scan_lists, "data_cleaning", lambda memb_list: pd.DataFrame({"zip": [4101, "04101-1234"]}))
+    memb_lists = get_membership_lists("fake_membership_list", BRANCH_ZIPS_PATH)
+    assert [memb_list["zip"].tolist() for memb_list in memb_lists.values()] == [[4101, "04101-1234"]] * len(memb_lists)
+    assert "Could not write cached lists" in caplog.text
+    assert get_cache_manifest(tmp_path / "fake_membership_list") == {}
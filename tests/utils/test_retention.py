@@ -0,0 +1,17 @@
+"""Perform testing to ensure the retention calculations summarize membership lengths correctly"""
+
+import pandas as pd
+
+from src.utils.retention import tenure_shares
+
+
+def test_tenure_shares():
+    """Ensure tenure shares are ordered by year, cap long memberships, and skip missing lengths"""
+    shares = tenure_shares(pd.Series([0, 1, 1, 9, 12, None]))
+    assert shares.index.tolist() == [0, 1, 8]
+    assert shares.tolist() == [0.2, 0.4, 0.4]
+
+
+def test_tenure_shares_empty():
+    """Ensure a list with no matching members has no tenure shares"""
+    assert tenure_shares(pd.Series([], dtype="int32")).empty